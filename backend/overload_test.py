@@ -0,0 +1,177 @@
+"""
+Synthetic overload test for admission control
+Runs the app in-process against a temporary SQLite database, so no MySQL or
+running server is needed:
+    python overload_test.py
+Checks the 429/503 responses and Retry-After headers, then floods
+/fare/calculate while paced users read /fare/user-history. Asserts that
+almost none of the paced requests are shed and that the p99 latency of the
+successful ones stays bounded. Exits non-zero if any check fails.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+
+# Point the app at a throwaway database before it is imported
+TEMP_DIR = tempfile.mkdtemp(prefix="fairfares-overload-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEMP_DIR, 'primary.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+
+import app as fairfares  # noqa: E402
+
+FLOOD_CLIENTS = 200
+# Paced users ask for a fifth of their /fare/user-history limit, well inside the light share
+PACED_CLIENTS = 40
+PACED_INTERVAL = 1.0
+# Pause between flood requests: 200 clients still offer ~4000 req/s, far above
+# their limits, without the generator starving the shared event loop
+FLOOD_INTERVAL = 0.05
+# Paced users browse alone for a while before the flood starts
+WARMUP_SECONDS = 3.0
+OVERLOAD_SECONDS = 8.0
+# Paced users must never wait much longer than the admission queue allows,
+# and almost none of them may be shed
+P99_BOUND = fairfares.ADMISSION_QUEUE_TIMEOUT + 1.0
+MAX_PACED_SHED_SHARE = 0.01
+CALCULATE_BODY = {"district": 1, "start_location": "Balayan"}
+
+async def asgi_request(method: str, path: str, srcode: str = "", body: dict = None, client: str = "10.0.0.1"):
+    """Send one request straight to the ASGI app; return (status, headers)"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": f"srcode={srcode}".encode() if srcode else b"",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "client": (client, 50000),
+        "server": ("testserver", 80),
+    }
+    response = {}
+    finished = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {key.decode().lower(): value.decode() for key, value in message["headers"]}
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            finished.set()
+
+    await fairfares.app(scope, receive, send)
+    finished.set()
+    return response["status"], response["headers"]
+
+def setup_database():
+    """Create the tables and one account per simulated client"""
+    fairfares.Base.metadata.create_all(fairfares.engine)
+    db = fairfares.SessionLocal()
+    try:
+        for name in ["LIMIT"] + [f"FLOOD{i}" for i in range(FLOOD_CLIENTS)] + [f"PACED{i}" for i in range(PACED_CLIENTS)]:
+            db.add(fairfares.User(srcode=name, name=name, college="Test", password="test"))
+        db.commit()
+    finally:
+        db.close()
+
+async def check_rate_limit():
+    """A single SRCODE gets 429 with Retry-After once its burst is spent"""
+    burst = int(fairfares.RATE_LIMITS["/fare/calculate"][1])
+    results = [await asgi_request("POST", "/fare/calculate", "LIMIT", CALCULATE_BODY, "10.1.0.1") for _ in range(burst + 2)]
+    statuses = [status_code for status_code, _ in results]
+    assert statuses[:burst] == [200] * burst, statuses
+    assert statuses[burst:] == [429, 429], statuses
+    assert int(results[-1][1]["retry-after"]) >= 1, results[-1][1]
+    print(f"rate limit: {burst} allowed, then 429 with Retry-After {results[-1][1]['retry-after']}")
+
+async def check_queue_timeout():
+    """With the pool exhausted, requests wait ADMISSION_QUEUE_TIMEOUT and get 503"""
+    capacity = fairfares.pool_capacity(fairfares.engine)
+    held = [fairfares.engine.connect() for _ in range(capacity)]
+    try:
+        started = time.perf_counter()
+        status_code, headers = await asgi_request("GET", "/fare/user-history", "PACED0", client="10.2.0.1")
+        waited = time.perf_counter() - started
+    finally:
+        for connection in held:
+            connection.close()
+    assert status_code == 503, status_code
+    assert int(headers["retry-after"]) >= 1, headers
+    assert fairfares.ADMISSION_QUEUE_TIMEOUT <= waited < fairfares.ADMISSION_QUEUE_TIMEOUT + 0.5, waited
+    status_code, _ = await asgi_request("GET", "/fare/user-history", "PACED0", client="10.2.0.1")
+    assert status_code == 200, status_code
+    print(f"queue timeout: 503 after {waited:.2f}s with the pool full, 200 once connections were released")
+
+async def run_overload():
+    """Flood /fare/calculate and measure paced /fare/user-history latency"""
+    flood_at = time.perf_counter() + WARMUP_SECONDS
+    stop_at = flood_at + OVERLOAD_SECONDS
+    flood_statuses = {}
+    paced_statuses = {}
+    paced_latencies = []
+
+    async def flood(index: int):
+        await asyncio.sleep(flood_at - time.perf_counter())
+        while time.perf_counter() < stop_at:
+            status_code, _ = await asgi_request("POST", "/fare/calculate", f"FLOOD{index}", CALCULATE_BODY, f"10.3.{index // 250}.{index % 250}")
+            flood_statuses[status_code] = flood_statuses.get(status_code, 0) + 1
+            await asyncio.sleep(FLOOD_INTERVAL)
+
+    async def paced(index: int):
+        # Spread paced users across the interval instead of starting in lockstep
+        await asyncio.sleep(PACED_INTERVAL * index / PACED_CLIENTS)
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            status_code, _ = await asgi_request("GET", "/fare/user-history", f"PACED{index}", client=f"10.4.0.{index}")
+            # Rejections are fast; count them as failures, not latency samples
+            if status_code == 200:
+                paced_latencies.append(time.perf_counter() - started)
+            paced_statuses[status_code] = paced_statuses.get(status_code, 0) + 1
+            await asyncio.sleep(PACED_INTERVAL)
+
+    await asyncio.gather(*[flood(i) for i in range(FLOOD_CLIENTS)], *[paced(i) for i in range(PACED_CLIENTS)])
+
+    paced_total = sum(paced_statuses.values())
+    paced_shed = paced_total - paced_statuses.get(200, 0)
+    assert paced_latencies, f"no paced request succeeded: {paced_statuses}"
+    paced_latencies.sort()
+    p50 = paced_latencies[len(paced_latencies) // 2]
+    p99 = paced_latencies[min(len(paced_latencies) - 1, int(len(paced_latencies) * 0.99))]
+    print(f"overload: flood statuses {dict(sorted(flood_statuses.items()))}")
+    print(f"overload: paced statuses {dict(sorted(paced_statuses.items()))}, p50 {p50:.3f}s, p99 {p99:.3f}s (bound {P99_BOUND:.2f}s)")
+    assert paced_shed <= paced_total * MAX_PACED_SHED_SHARE, f"{paced_shed} of {paced_total} paced requests failed"
+    assert p99 < P99_BOUND, f"paced p99 {p99:.3f}s exceeds {P99_BOUND:.2f}s"
+
+async def main():
+    setup_database()
+    try:
+        await check_rate_limit()
+        await check_queue_timeout()
+        await run_overload()
+    finally:
+        fairfares.engine.dispose()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    print("All admission control checks passed.")
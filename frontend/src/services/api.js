@@ -2,6 +2,8 @@ import axios from 'axios'
 
 const api = axios.create({
   baseURL: 'http://localhost:8000',
+  // Send the backend's read-your-writes cookie so reads after a save see it
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json'
   }